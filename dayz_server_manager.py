@@ -6,6 +6,7 @@ import subprocess
 import re
 import shutil
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 # Configuration
 steamcmd_dir:str = None
@@ -18,18 +19,17 @@ manager_config:str = "manager.cfg"
 server_config:str = "serverDZ.cfg"
 modslist_file:str = "modslist.csv"
 
-def remove_comments(line:str):
-    comment_index = line.find('#')
-    if (comment_index >= 0):
-        if (comment_index == 0):
-            return ""
-        return line[:comment_index]
+# Regular expression to match valid file names
+_VALID_FILE_NAME_RE = re.compile(r'^[a-zA-Z0-9_\-. ]+$')
+# Regular expression to match 'key = "value" # comment' lines in the manager config
+_CONFIG_LINE_RE = re.compile(r'^[ \t]*([A-Za-z_]\w*)[ \t]*=[ \t]*"?([^"#\n]*?)"?[ \t]*(?:#.*)?$', re.MULTILINE)
+
+def remove_comments(line:str) -> str:
+    return line.partition('#')[0]
 
 def try_cast_str_to_int(value:str):
-    try:
-        return int(value)
-    except:
-        return None
+    value = value.strip()
+    return int(value) if value.removeprefix('-').isdecimal() else None
 
 def check_global_vars():
     if steamcmd_dir is None:
@@ -44,29 +44,18 @@ def check_global_vars():
         raise ValueError("The 'username' configuration variable is not set.")
 
 def load_manager_config():
+    global steamcmd_dir, install_dir, server_app_id, game_app_id, username
+
     with open(manager_config, 'r') as file:
-        for line in file:
-            line = line.strip()
-            line = remove_comments(line)
-            if not line:
-                continue
+        config = {match.group(1): match.group(2) for match in _CONFIG_LINE_RE.finditer(file.read())}
+
+    steamcmd_dir = config.get('steamcmd_dir')
+    install_dir = config.get('install_dir')
+    server_app_id = try_cast_str_to_int(config.get('server_app_id', ''))
+    game_app_id = try_cast_str_to_int(config.get('game_app_id', ''))
+    username = config.get('username')
 
-            key, value = line.split('=')
-            key = key.strip()
-            value = value.strip().strip('"')
-
-            if key == 'steamcmd_dir':
-                steamcmd_dir = value
-            elif key == 'install_dir':
-                install_dir = value
-            elif key == 'server_app_id':
-                server_app_id = try_cast_str_to_int(value)
-            elif key == 'game_app_id':
-                game_app_id = try_cast_str_to_int(value)
-            elif key == 'username':
-                username = value
-        
-        check_global_vars()
+    check_global_vars()
             
 def get_steamcmd_exe() -> str:
     return f"{steamcmd_dir}/steamcmd.exe"
@@ -148,9 +137,7 @@ def create_if_missing_empty_modslist():
     print("\n")
 
 def is_valid_file_name(name):
-    # Regular expression to match valid file names
-    pattern = r'^[a-zA-Z0-9_\-. ]+$'
-    return re.match(pattern, name) is not None
+    return _VALID_FILE_NAME_RE.match(name) is not None
 
 def parse_modslist(file_path: str) -> dict[int, str]:
     data = {}
@@ -163,104 +150,154 @@ def parse_modslist(file_path: str) -> dict[int, str]:
             elements = line.split(',')
             if len(elements) != 2:
                 raise ValueError(f"Invalid line format: {line}")
-            try:
-                key = int(elements[0].strip())
-            except ValueError:
-                raise ValueError(f"Invalid workshop ID: {elements[0].strip()}")
+            key_str = elements[0].strip()
+            if not key_str.isdecimal():
+                raise ValueError(f"Invalid workshop ID: {key_str}")
+            key = int(key_str)
             value = elements[1].strip()
             if not is_valid_file_name(value):
                 raise ValueError(f"Invalid mod name: {value}, must be a valid file name.")
             data[key] = value
     return data
 
-def run_steamcmd(args: str):
-    run_command = f"{get_server_exe()} {args}"
+def run_steamcmd(args: list[str]):
+    run_command = [get_steamcmd_exe(), *args]
     try:
         subprocess.run(run_command, check=True)
     except subprocess.CalledProcessError as e:
         raise ChildProcessError(f"SteamCMD error {e}")
 
-def update(validate:bool):
-    run_command = f"+force_install_dir {install_dir} +login {username} +app_update {server_app_id} {'validate' if (validate) else ''}"
+def update(modslist:dict[int, str], validate:bool):
+    run_command = ["+force_install_dir", install_dir, "+login", username, "+app_update", str(server_app_id), *(["validate"] if (validate) else [])]
+    for workshop_id in modslist:
+        run_command.extend(["+workshop_download_item", str(game_app_id), str(workshop_id)])
 
-    mods_list_file = "./modslist.txt"
-    if (os.path.exists(mods_list_file)):
-        mods_list = parse_modslist(mods_list_file)
-        mods_args = ""
-        for workshop_id in mods_list:
-            mods_args += f" +workshop_download_item {game_app_id} {workshop_id} "
-        run_command += mods_args
-
-    run_command += " +quit"
+    run_command.append("+quit")
 
     run_steamcmd(run_command)
 
 def update_server(validate:bool):
     print(f"Attempting to download/update server with app_id: {server_app_id} @ '{install_dir}'\n\n")
-    run_steamcmd(f"+force_install_dir {install_dir} +login {username} +app_update {server_app_id} {'validate' if (validate) else ''} +quit")
+    run_steamcmd(["+force_install_dir", install_dir, "+login", username, "+app_update", str(server_app_id), *(["validate"] if (validate) else []), "+quit"])
     print("\n\n")
 
 def update_mods(modslist:dict[int, str], validate:bool):
     if (len(modslist) <= 0):
         return
 
-    run_command = f"+login {username}"
-    mods_args = ""
+    run_command = ["+login", username]
     for workshop_id, mod_name in modslist.items():
         print(f"Attempting to download/update item: {workshop_id} ({mod_name})")
-        mods_args += f" +workshop_download_item {game_app_id} {workshop_id}{' validate' if (validate) else ''}"
+        run_command.extend(["+workshop_download_item", str(game_app_id), str(workshop_id)])
+        if (validate):
+            run_command.append("validate")
     print("\n")
-    run_command += mods_args
 
-    run_command += " +quit"
+    run_command.append("+quit")
     run_steamcmd(run_command)
     print("\n\n")
 
+def is_outdated(source:os.DirEntry, destination:os.DirEntry) -> bool:
+    # copyfile gives the destination a fresh mtime, so a newer source means it changed since the last copy
+    source_stat = source.stat()
+    destination_stat = destination.stat()
+    return source_stat.st_size != destination_stat.st_size or source_stat.st_mtime_ns > destination_stat.st_mtime_ns
+
+def collect_source_files(source_dir, destination_dir, sources:dict[str, os.DirEntry]):
+    # Keyed by destination path, so a later source for the same file replaces an earlier one
+    with os.scandir(source_dir) as entries:
+        for entry in entries:
+            destination_path = os.path.join(destination_dir, entry.name)
+            if entry.is_dir():
+                collect_source_files(entry.path, destination_path, sources)
+            elif entry.is_file():
+                sources[destination_path] = entry
+
+def collect_outdated_files(sources:dict[str, os.DirEntry]) -> list[tuple[str, str]]:
+    # Each destination directory is created and scanned once; DirEntry caches the stat results used by is_outdated
+    scanned_dirs:dict[str, dict[str, os.DirEntry]] = {}
+    pairs:list[tuple[str, str]] = []
+    for destination_path, source in sources.items():
+        destination_dir = os.path.dirname(destination_path)
+        existing_files = scanned_dirs.get(destination_dir)
+        if existing_files is None:
+            os.makedirs(destination_dir, exist_ok=True)
+            with os.scandir(destination_dir) as entries:
+                existing_files = {entry.name: entry for entry in entries}
+            scanned_dirs[destination_dir] = existing_files
+        existing_file = existing_files.get(os.path.basename(destination_path))
+        if existing_file is None or is_outdated(source, existing_file):
+            pairs.append((source.path, destination_path))
+    return pairs
+
+def copy_files(pairs:list[tuple[str, str]]):
+    # Destination directories must already exist and each destination must appear once (see collect_outdated_files),
+    # so the parallel copies never race on makedirs or write the same file
+    if (len(pairs) <= 1):
+        for source_file, destination_file in pairs:
+            shutil.copyfile(source_file, destination_file)
+        return
+
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4, len(pairs))) as executor:
+        list(executor.map(lambda pair: shutil.copyfile(*pair), pairs))
+
 def quick_copy_recursive(source_dir, destination_dir):
-    for root, dirs, files in os.walk(source_dir):
-        for file in files:
-            source_file = os.path.join(root, file)
-            destination_file = os.path.join(destination_dir, os.path.relpath(source_file, source_dir))
-            if not os.path.exists(destination_file):
-                os.makedirs(os.path.dirname(destination_file), exist_ok=True)
-                shutil.copy2(source_file, destination_file)
+    sources:dict[str, os.DirEntry] = {}
+    collect_source_files(source_dir, destination_dir, sources)
+    copy_files(collect_outdated_files(sources))
 
 def full_copy_recursive(source_dir, destination_dir):
     shutil.copytree(source_dir, destination_dir, dirs_exist_ok=True)
 
+def remove_symlink(path):
+    # Directory symlinks on Windows must be removed with rmdir
+    if (os.name == 'nt'):
+        os.rmdir(path)
+    else:
+        os.unlink(path)
+
 def install_mods(modslist:dict[int, str]):
     workshop_dir = f"{steamcmd_dir}/steamapps/workshop/content/{game_app_id}/"
     server_keys_dir = f"{install_dir}/keys"
 
+    # Read the workshop directory once instead of resolving every item's full path
+    downloaded_items:dict[str, str] = {}
+    if (os.path.isdir(workshop_dir)):
+        with os.scandir(workshop_dir) as entries:
+            downloaded_items = {entry.name: entry.path for entry in entries if entry.is_dir()}
+
+    # Keys from every mod are collected first so that, when mods ship keys with the same name,
+    # the last mod in the modslist always wins and a single thread pool drains the copies
+    key_sources:dict[str, os.DirEntry] = {}
     for workshop_id, mod_name in modslist.items():
         print(f"Attempting to install item: {workshop_id} ({mod_name})")
-        item_dir = f"{workshop_dir}/{workshop_id}"
-        if (not os.path.exists(item_dir)):
+        item_dir = downloaded_items.get(str(workshop_id))
+        if (item_dir is None):
             continue
 
         server_item_dir = f"{install_dir}/@{mod_name}"
-        # if (not os.path.exists(server_item_dir)):
-        #     os.mkdir(server_item_dir)
-        os.symlink(item_dir, server_item_dir)
-        
+        if (os.path.islink(server_item_dir)):
+            if (os.path.realpath(server_item_dir) != os.path.realpath(item_dir)):
+                remove_symlink(server_item_dir)
+                os.symlink(item_dir, server_item_dir)
+        elif (os.path.lexists(server_item_dir)):
+            print(f"'{server_item_dir}' already exists and is not a symlink, leaving it in place.")
+        else:
+            os.symlink(item_dir, server_item_dir)
+
         item_keys_dir = f"{item_dir}/keys"
         if (os.path.exists(item_keys_dir)):
-            quick_copy_recursive(item_keys_dir, server_keys_dir)
+            collect_source_files(item_keys_dir, server_keys_dir, key_sources)
+
+    copy_files(collect_outdated_files(key_sources))
     print("\n\n")
 
 
 def run_server(modslist:dict[int, str]):
-    run_command = f"{get_server_exe()} -config=serverDZ.cfg"
+    run_command = [get_server_exe(), f"-config={server_config}"]
     if (len(modslist) > 0):
-        run_command += f" \"-mod="
-        mods = ""
-        first:bool = True
-        for workshop_id, mod_name in modslist.items():
-            if (first):
-                mods += f"@{mod_name}"
-            else:
-                mods += f";@{mod_name}"
-        run_command += f"{mods}\""
+        mods = ";".join(f"@{mod_name}" for mod_name in modslist.values())
+        run_command.append(f"-mod={mods}")
         print(f"Attempting to run server using the config: '{server_config}' and mods: '{mods}'\n\n")
     else:
         print(f"Attempting to run server using the config: '{server_config}'\n\n")
@@ -279,7 +316,7 @@ def main():
 
         # update_server(validate=False)
 
-        modslist = parse_modslist("./modslist.txt")
+        modslist = parse_modslist(modslist_file)
         if (len(modslist) > 0):
             # update_mods(modslist=modslist, validate=False)
             install_mods(modslist=modslist)